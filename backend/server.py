@@ -1,11 +1,19 @@
-from fastapi import FastAPI, HTTPException, Depends, Query, Body
+from fastapi import FastAPI, HTTPException, Depends, Query, Body, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from motor.motor_asyncio import AsyncIOMotorClient
-from pydantic import BaseModel, Field
+from pymongo import ASCENDING, DESCENDING, ReplaceOne, UpdateOne
+from pymongo.errors import DuplicateKeyError, ExecutionTimeout
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
 from typing import Optional, List, Dict, Any
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone, timedelta
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+import asyncio
+import heapq
+import math
 import os
+import time
 import uuid
 import logging
 from dotenv import load_dotenv
@@ -17,16 +25,183 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_background_task(run_startup_jobs())
+    yield
+    # Cancel startup jobs and wait for them, so they hand back their migration claims
+    for task in list(background_tasks):
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+
 # FastAPI app
 app = FastAPI(
     title="FMAA Dashboard API",
     description="Federated Micro-Agents Architecture Dashboard API",
     version="2.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    lifespan=lifespan
 )
 
-# CORS configuration
+# Admission control: per endpoint class concurrency limits with bounded wait
+# queues, so dashboard spikes cannot starve health checks and metric ingestion
+class AdmissionLimit:
+    """Concurrency slots, wait queue and shed counters for one endpoint class"""
+    
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, timeout_ms: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.timeout_ms = timeout_ms
+        self.retry_after = max(1, math.ceil(timeout_ms / 1000))
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "shed_queue_full": 0,
+            "shed_deadline": 0,
+            "expired_in_handler": 0,
+            "queue_time_ms_total": 0.0,
+            "queue_time_ms_max": 0.0
+        }
+
+def load_admission_limit(name: str, max_concurrent: int, max_queue: int, timeout_ms: int) -> AdmissionLimit:
+    """Build an endpoint class limit, allowing ADMISSION_<CLASS>_* env overrides"""
+    prefix = f"ADMISSION_{name.upper()}"
+    return AdmissionLimit(
+        name,
+        int(os.getenv(f"{prefix}_MAX_CONCURRENT", max_concurrent)),
+        int(os.getenv(f"{prefix}_MAX_QUEUE", max_queue)),
+        int(os.getenv(f"{prefix}_TIMEOUT_MS", timeout_ms))
+    )
+
+ADMISSION_LIMITS = {
+    "health": load_admission_limit("health", 50, 100, 1000),
+    "ingest": load_admission_limit("ingest", 50, 500, 2000),
+    "heavy": load_admission_limit("heavy", 4, 16, 10000),
+    "default": load_admission_limit("default", 20, 100, 5000)
+}
+
+# Clients may shorten (never extend) the class timeout with this header
+REQUEST_TIMEOUT_HEADER = "x-request-timeout-ms"
+
+# Monotonic deadline of the request being served, read by handlers and queries
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+request_class: ContextVar[str] = ContextVar("request_class", default="default")
+
+# Same bool parsing FastAPI applies to query parameters like include_stats
+query_bool = TypeAdapter(bool)
+
+def is_truthy_query_param(request: Request, name: str) -> bool:
+    try:
+        return query_bool.validate_python(request.query_params.get(name, False))
+    except ValidationError:
+        return False
+
+def classify_request(request: Request) -> str:
+    """Map a request to its admission control endpoint class"""
+    path = request.url.path.rstrip("/")
+    method = request.method
+    
+    if path.startswith("/api/health"):
+        return "health"
+    if method == "POST" and path in ("/api/performance-monitor", "/api/sentiment-agent"):
+        return "ingest"
+    if method == "GET":
+        if path in ("/api/performance-monitor", "/api/sentiment-agent/analytics"):
+            return "heavy"
+        # The text filter is an unindexed, case-insensitive regex over every analysis
+        if path == "/api/sentiment-agent" and request.query_params.get("text_filter"):
+            return "heavy"
+        if path == "/api/agent-factory" and is_truthy_query_param(request, "include_stats"):
+            return "heavy"
+    return "default"
+
+def get_remaining_ms() -> Optional[int]:
+    """Milliseconds left before the current request's deadline, if one is set"""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return max(0, int((deadline - time.monotonic()) * 1000))
+
+def apply_deadline(cursor):
+    """Bound a Mongo cursor by the time left on the current request"""
+    remaining = get_remaining_ms()
+    if remaining is None:
+        return cursor
+    if remaining <= 0:
+        raise ExecutionTimeout("Request deadline exceeded before query")
+    return cursor.max_time_ms(remaining)
+
+def shed_response(limit: AdmissionLimit, status_code: int, detail: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": detail},
+        headers={"Retry-After": str(limit.retry_after)}
+    )
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    if request.method == "OPTIONS" or not request.url.path.startswith("/api"):
+        return await call_next(request)
+    
+    limit = ADMISSION_LIMITS[classify_request(request)]
+    timeout_ms = limit.timeout_ms
+    try:
+        timeout_ms = min(timeout_ms, max(0, int(request.headers.get(REQUEST_TIMEOUT_HEADER, timeout_ms))))
+    except ValueError:
+        pass
+    
+    arrived = time.monotonic()
+    deadline = arrived + timeout_ms / 1000
+    
+    if deadline <= arrived:
+        # A zero budget can never be met, even with a slot free
+        limit.stats["shed_deadline"] += 1
+        return shed_response(limit, 503, "Request deadline exceeded before admission")
+    
+    if not limit.semaphore.locked():
+        # A free slot is taken synchronously, without joining the wait queue
+        await limit.semaphore.acquire()
+    elif limit.waiting >= limit.max_queue:
+        limit.stats["shed_queue_full"] += 1
+        return shed_response(limit, 429, f"Too many pending {limit.name} requests")
+    else:
+        limit.waiting += 1
+        limit.stats["queued"] += 1
+        try:
+            await asyncio.wait_for(limit.semaphore.acquire(), timeout=max(0.0, deadline - arrived))
+        except asyncio.TimeoutError:
+            limit.stats["shed_deadline"] += 1
+            return shed_response(limit, 503, f"Request deadline exceeded waiting for a {limit.name} slot")
+        finally:
+            limit.waiting -= 1
+            queue_time_ms = (time.monotonic() - arrived) * 1000
+            limit.stats["queue_time_ms_total"] += queue_time_ms
+            limit.stats["queue_time_ms_max"] = max(limit.stats["queue_time_ms_max"], queue_time_ms)
+    
+    limit.stats["admitted"] += 1
+    limit.active += 1
+    deadline_token = request_deadline.set(deadline)
+    class_token = request_class.set(limit.name)
+    try:
+        return await call_next(request)
+    finally:
+        request_class.reset(class_token)
+        request_deadline.reset(deadline_token)
+        limit.active -= 1
+        limit.semaphore.release()
+
+@app.exception_handler(ExecutionTimeout)
+async def deadline_exceeded_handler(request: Request, exc: ExecutionTimeout):
+    limit = ADMISSION_LIMITS[request_class.get()]
+    limit.stats["expired_in_handler"] += 1
+    return shed_response(limit, 503, "Request deadline exceeded")
+
+# CORS configuration (registered after admission control so shed responses get CORS headers)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Configure for production
@@ -37,9 +212,42 @@ app.add_middleware(
 
 # MongoDB connection
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/fmaa_dashboard")
-client = AsyncIOMotorClient(MONGO_URL)
+client = AsyncIOMotorClient(MONGO_URL, tz_aware=True)
 db = client.get_database()
 
+# Sentiment analytics settings
+SENTIMENT_LABELS = ["positive", "negative", "neutral"]
+SENTIMENT_HISTOGRAM_BINS = 10  # Equal-width bins over the [-1, 1] score range
+SENTIMENT_ANALYTICS_MAX_HOURS = 24 * 7
+SENTIMENT_BACKFILL_BATCH_SIZE = 500
+SENTIMENT_BACKFILL_GRACE_SECONDS = 60  # Lets in-flight live increments land before a re-rebuild
+
+# One-off startup jobs record their state in the migrations collection; a
+# running claim older than the lease is treated as abandoned and taken over
+MIGRATION_LEASE_SECONDS = 600
+MIGRATION_POLL_SECONDS = 30
+
+# Strong references to fire-and-forget tasks, which the event loop only holds weakly
+background_tasks = set()
+
+# Timestamp fields stored as native BSON dates, per collection
+DATETIME_FIELDS = {
+    "sentiment_analyses": ["created_at"],
+    "user_recommendations": ["created_at"],
+    "performance_metrics": ["timestamp", "metadata.recorded_at"],
+    "agents": ["created_at", "updated_at"],
+    "agent_tasks": ["created_at", "last_activity"],
+    "system_logs": ["created_at"]
+}
+DATETIME_MIGRATION_BATCH_SIZE = 500
+DATETIME_MIGRATION_BATCH_PAUSE_MS = int(os.getenv("DATETIME_MIGRATION_BATCH_PAUSE_MS", 100))
+
+# Until every legacy ISO string has been converted, time-range queries also
+# match string values so migrated and unmigrated documents are both visible.
+# Known limitation of this dual-read period: BSON sorts every date ahead of
+# every string, so newest-first listings put unmigrated documents last.
+datetime_migration_complete = False
+
 # Pydantic models
 class SentimentAnalysisRequest(BaseModel):
     text: str = Field(..., min_length=1, max_length=5000)
@@ -77,11 +285,43 @@ class AgentUpdateRequest(BaseModel):
     config: Optional[Dict[str, Any]] = None
     description: Optional[str] = None
 
+def start_background_task(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def run_startup_jobs():
+    # Sequential: the backfill must not read created_at while it is being migrated
+    await ensure_indexes()
+    await migrate_datetime_fields()
+    await backfill_sentiment_analytics()
+
 # Health check
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "service": "fmaa-dashboard-api", "timestamp": datetime.now(timezone.utc).isoformat()}
 
+@app.get("/api/health/admission")
+async def get_admission_stats():
+    classes = {}
+    for name, limit in ADMISSION_LIMITS.items():
+        stats = dict(limit.stats)
+        stats["queue_time_ms_avg"] = round(stats["queue_time_ms_total"] / stats["queued"], 2) if stats["queued"] else 0
+        stats["queue_time_ms_total"] = round(stats["queue_time_ms_total"], 2)
+        stats["queue_time_ms_max"] = round(stats["queue_time_ms_max"], 2)
+        classes[name] = {
+            "limits": {
+                "max_concurrent": limit.max_concurrent,
+                "max_queue": limit.max_queue,
+                "timeout_ms": limit.timeout_ms
+            },
+            "active": limit.active,
+            "waiting": limit.waiting,
+            "stats": stats
+        }
+    return {"status": "success", "data": classes}
+
 # Sentiment Analysis Agent
 @app.get("/api/sentiment-agent")
 async def get_sentiment_analyses(
@@ -94,7 +334,8 @@ async def get_sentiment_analyses(
         if text_filter:
             query["text"] = {"$regex": text_filter, "$options": "i"}
         
-        cursor = db.sentiment_analyses.find(query).sort("created_at", -1).skip(offset).limit(limit)
+        # Unmigrated string timestamps sort after all dates until the datetime migration finishes
+        cursor = apply_deadline(db.sentiment_analyses.find(query).sort("created_at", -1).skip(offset).limit(limit))
         data = await cursor.to_list(length=limit)
         
         # Convert ObjectId to string
@@ -110,6 +351,8 @@ async def get_sentiment_analyses(
                 "count": len(data)
             }
         }
+    except ExecutionTimeout:
+        raise
     except Exception as e:
         logger.error(f"Error in get_sentiment_analyses: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -128,12 +371,15 @@ async def analyze_sentiment(request: SentimentAnalysisRequest):
             "score": sentiment_result["score"],
             "confidence": sentiment_result["confidence"],
             "keywords": sentiment_result["keywords"],
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
         
         # Save to database
         await db.sentiment_analyses.insert_one(doc)
         
+        # Keep hourly analytics counters in step with the raw analyses
+        await update_sentiment_analytics(doc)
+        
         return {
             "status": "success",
             "data": {
@@ -150,6 +396,34 @@ async def analyze_sentiment(request: SentimentAnalysisRequest):
         logger.error(f"Error in analyze_sentiment: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/sentiment-agent/analytics")
+async def get_sentiment_analytics(
+    hours: int = Query(24, ge=1, le=SENTIMENT_ANALYTICS_MAX_HOURS),
+    top_k: int = Query(10, ge=1, le=50)
+):
+    try:
+        now = datetime.now(timezone.utc)
+        bucket_ids = [get_sentiment_bucket(now - timedelta(hours=offset)) for offset in range(hours - 1, -1, -1)]
+        
+        # At most `hours` bucket documents are read, however large the history is
+        cursor = apply_deadline(db.sentiment_analytics.find({"_id": {"$gte": bucket_ids[0]}}).sort("_id", 1))
+        buckets = await cursor.to_list(length=hours)
+        
+        return {
+            "status": "success",
+            "data": summarize_sentiment_buckets(bucket_ids, buckets, top_k),
+            "window": {
+                "hours": hours,
+                "start_bucket": bucket_ids[0],
+                "end_bucket": bucket_ids[-1]
+            }
+        }
+    except ExecutionTimeout:
+        raise
+    except Exception as e:
+        logger.error(f"Error in get_sentiment_analytics: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Recommendation Agent
 @app.get("/api/recommendation-agent")
 async def get_recommendations(
@@ -165,7 +439,7 @@ async def get_recommendations(
         if user_id:
             query["user_id"] = user_id
         
-        cursor = db.user_recommendations.find(query).sort("rating", -1).skip(offset).limit(limit)
+        cursor = apply_deadline(db.user_recommendations.find(query).sort("rating", -1).skip(offset).limit(limit))
         data = await cursor.to_list(length=limit)
         
         # Convert ObjectId to string
@@ -181,6 +455,8 @@ async def get_recommendations(
                 "count": len(data)
             }
         }
+    except ExecutionTimeout:
+        raise
     except Exception as e:
         logger.error(f"Error in get_recommendations: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -205,7 +481,7 @@ async def generate_recommendations(request: RecommendationRequest):
                 "price": rec.get("price"),
                 "recommendation_score": rec["score"],
                 "metadata": rec,
-                "created_at": datetime.now(timezone.utc).isoformat()
+                "created_at": datetime.now(timezone.utc)
             }
             docs.append(doc)
         
@@ -243,14 +519,14 @@ async def get_performance_metrics(
             query["service"] = service
         if metric_type:
             query["metric_type"] = metric_type
-        if start_date:
-            query["timestamp"] = {"$gte": start_date}
-        if end_date:
-            if "timestamp" not in query:
-                query["timestamp"] = {}
-            query["timestamp"]["$lte"] = end_date
-        
-        cursor = db.performance_metrics.find(query).sort("timestamp", -1).skip(offset).limit(limit)
+        query.update(build_time_range_query(
+            "timestamp",
+            parse_date_bound(start_date, "start_date"),
+            parse_date_bound(end_date, "end_date", end_of_day=True)
+        ))
+        
+        # Unmigrated string timestamps sort after all dates until the datetime migration finishes
+        cursor = apply_deadline(db.performance_metrics.find(query).sort("timestamp", -1).skip(offset).limit(limit))
         data = await cursor.to_list(length=limit)
         
         # Convert ObjectId to string
@@ -276,6 +552,8 @@ async def get_performance_metrics(
                 "end_date": end_date
             }
         }
+    except (HTTPException, ExecutionTimeout):
+        raise
     except Exception as e:
         logger.error(f"Error in get_performance_metrics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -283,7 +561,7 @@ async def get_performance_metrics(
 @app.post("/api/performance-monitor")
 async def record_performance_metric(request: PerformanceMetricRequest):
     try:
-        timestamp = datetime.now(timezone.utc).isoformat()
+        timestamp = datetime.now(timezone.utc)
         
         doc = {
             "_id": str(uuid.uuid4()),
@@ -337,7 +615,7 @@ async def get_agents(
         if status:
             query["status"] = status
         
-        cursor = db.agents.find(query).sort("created_at", -1).skip(offset).limit(limit)
+        cursor = apply_deadline(db.agents.find(query).sort("created_at", -1).skip(offset).limit(limit))
         data = await cursor.to_list(length=limit)
         
         # Convert ObjectId to string
@@ -362,6 +640,8 @@ async def get_agents(
                 "count": len(data)
             }
         }
+    except ExecutionTimeout:
+        raise
     except Exception as e:
         logger.error(f"Error in get_agents: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -378,7 +658,7 @@ async def create_agent(request: AgentRequest):
             )
         
         agent_id = str(uuid.uuid4())
-        timestamp = datetime.now(timezone.utc).isoformat()
+        timestamp = datetime.now(timezone.utc)
         
         doc = {
             "_id": agent_id,
@@ -468,6 +748,399 @@ def analyze_text_sentiment(text: str) -> Dict[str, Any]:
         "keywords": keywords[:10]  # Limit to top 10 keywords
     }
 
+def to_datetime(value: Any) -> Optional[datetime]:
+    """Normalize a stored timestamp (BSON date or legacy ISO string) to aware UTC"""
+    if value is None:
+        return None
+    
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        text = str(value)
+        if text.endswith("Z"):
+            text = text[:-1] + "+00:00"
+        try:
+            parsed = datetime.fromisoformat(text)
+        except ValueError:
+            from dateutil.parser import parse
+            parsed = parse(text)
+    
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+def parse_date_bound(value: Optional[str], name: str, end_of_day: bool = False) -> Optional[datetime]:
+    """Parse a date or datetime query bound; a date-only end bound covers that whole day"""
+    if not value:
+        return None
+    
+    try:
+        if len(value) == 10:
+            day = datetime.combine(date.fromisoformat(value), datetime.min.time(), tzinfo=timezone.utc)
+            return day + timedelta(days=1) - timedelta(microseconds=1) if end_of_day else day
+        return to_datetime(value)
+    except (ValueError, OverflowError):
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: expected an ISO date or datetime")
+
+def build_time_range_query(
+    field: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """Build a range filter on a timestamp field, matching legacy strings while migrating"""
+    native = {}
+    if start:
+        native["$gte"] = to_datetime(start)
+    if end:
+        native["$lte"] = to_datetime(end)
+    if not native:
+        return {}
+    
+    if datetime_migration_complete:
+        return {field: native}
+    
+    legacy = {operator: value.isoformat() for operator, value in native.items()}
+    return {"$or": [{field: native}, {field: legacy}]}
+
+async def ensure_indexes():
+    """Create the indexes that back sorted listings and time-range scans"""
+    try:
+        await db.sentiment_analyses.create_index([("created_at", DESCENDING)])
+        await db.performance_metrics.create_index([("timestamp", DESCENDING)])
+        await db.performance_metrics.create_index([
+            ("service", ASCENDING),
+            ("metric_type", ASCENDING),
+            ("timestamp", DESCENDING)
+        ])
+        await db.agents.create_index([("created_at", DESCENDING)])
+        await db.agent_tasks.create_index([("agent_id", ASCENDING)])
+    except Exception as e:
+        logger.error(f"Error creating indexes: {e}")
+
+async def migrate_datetime_fields():
+    """Convert legacy ISO string timestamps to native datetimes in paced batches
+
+    One worker claims the migration; the others keep dual reads on and poll the
+    marker until it is done. Dual reads are switched off only once no string
+    values remain, so documents that failed to parse never drop out of queries.
+    """
+    global datetime_migration_complete
+    
+    claimed = await claim_migration("datetime_fields")
+    while not claimed:
+        marker = await db.migrations.find_one({"_id": "datetime_fields"})
+        status = marker.get("status") if marker else None
+        if status == "done":
+            datetime_migration_complete = True
+            return
+        if status == "failed":
+            # Retried on the next startup; dual reads stay on meanwhile
+            return
+        await asyncio.sleep(MIGRATION_POLL_SECONDS)
+        claimed = await claim_migration("datetime_fields", retry_failed=False)
+    
+    try:
+        for collection_name, fields in DATETIME_FIELDS.items():
+            collection = db[collection_name]
+            for field in fields:
+                converted = 0
+                last_id = None
+                while True:
+                    # Walk by _id so documents that fail to parse are not revisited
+                    query: Dict[str, Any] = {field: {"$type": "string"}}
+                    if last_id is not None:
+                        query["_id"] = {"$gt": last_id}
+                    cursor = collection.find(query, {field: 1}).sort("_id", 1)
+                    batch = await cursor.to_list(length=DATETIME_MIGRATION_BATCH_SIZE)
+                    if not batch:
+                        break
+                    last_id = batch[-1]["_id"]
+                    
+                    operations = []
+                    for doc in batch:
+                        value = doc
+                        for part in field.split("."):
+                            value = value[part]
+                        try:
+                            parsed = to_datetime(value)
+                        except (ValueError, OverflowError):
+                            logger.warning(f"Skipping unparseable {collection_name}.{field} on {doc['_id']}: {value!r}")
+                            continue
+                        # Match the old value so a concurrent write is never overwritten
+                        operations.append(UpdateOne(
+                            {"_id": doc["_id"], field: value},
+                            {"$set": {field: parsed}}
+                        ))
+                    
+                    if operations:
+                        result = await collection.bulk_write(operations, ordered=False)
+                        converted += result.modified_count
+                    
+                    # Pace the batches so live traffic keeps most of the database
+                    await renew_migration("datetime_fields")
+                    await asyncio.sleep(DATETIME_MIGRATION_BATCH_PAUSE_MS / 1000)
+                
+                if converted:
+                    logger.info(f"Migrated {converted} {collection_name}.{field} values to datetimes")
+        
+        remaining = 0
+        for collection_name, fields in DATETIME_FIELDS.items():
+            for field in fields:
+                remaining += await db[collection_name].count_documents({field: {"$type": "string"}})
+        if remaining:
+            logger.warning(f"{remaining} timestamp values are still strings; keeping dual reads on")
+            await release_migration("datetime_fields")
+            return
+        
+        await finish_migration("datetime_fields")
+        datetime_migration_complete = True
+    except asyncio.CancelledError:
+        await release_migration("datetime_fields")
+        raise
+    except Exception as e:
+        logger.error(f"Error migrating datetime fields: {e}")
+        await release_migration("datetime_fields")
+
+async def claim_migration(name: str, retry_failed: bool = True) -> bool:
+    """Atomically claim a one-off startup job; False if it is done or held elsewhere"""
+    now = datetime.now(timezone.utc)
+    try:
+        await db.migrations.insert_one({"_id": name, "status": "running", "claimed_at": now})
+        return True
+    except DuplicateKeyError:
+        pass
+    
+    # Take over a claim whose holder stopped renewing it (e.g. a worker that
+    # died) and, on startup, retry a job that previously failed
+    claimable = [{"status": "running", "claimed_at": {"$lt": now - timedelta(seconds=MIGRATION_LEASE_SECONDS)}}]
+    if retry_failed:
+        claimable.append({"status": "failed"})
+    taken = await db.migrations.find_one_and_update(
+        {"_id": name, "$or": claimable},
+        {"$set": {"status": "running", "claimed_at": now}}
+    )
+    return taken is not None
+
+async def renew_migration(name: str):
+    """Extend the lease on a running startup job"""
+    await db.migrations.update_one(
+        {"_id": name, "status": "running"},
+        {"$set": {"claimed_at": datetime.now(timezone.utc)}}
+    )
+
+async def finish_migration(name: str):
+    """Mark a startup job as done so no worker runs it again"""
+    await db.migrations.update_one(
+        {"_id": name},
+        {"$set": {"status": "done", "completed_at": datetime.now(timezone.utc)}}
+    )
+
+async def release_migration(name: str):
+    """Mark a startup job as failed so the next startup retries it"""
+    try:
+        await db.migrations.update_one(
+            {"_id": name, "status": "running"},
+            {"$set": {"status": "failed", "failed_at": datetime.now(timezone.utc)}}
+        )
+    except Exception as e:
+        logger.error(f"Error releasing migration {name}: {e}")
+
+def get_sentiment_bucket(moment: datetime) -> str:
+    """Get the hourly analytics bucket key for a point in time"""
+    return moment.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0).isoformat()
+
+def get_score_bin(score: float) -> int:
+    """Map a sentiment score in [-1, 1] to its histogram bin"""
+    index = int((max(-1.0, min(1.0, score)) + 1) * SENTIMENT_HISTOGRAM_BINS / 2)
+    return min(index, SENTIMENT_HISTOGRAM_BINS - 1)
+
+def build_sentiment_increments(doc: Dict[str, Any]) -> Dict[str, int]:
+    """Build the counter increments a single analysis contributes to its bucket"""
+    increments = {
+        "total": 1,
+        f"labels.{doc['sentiment']}": 1,
+        f"histogram.{get_score_bin(doc['score'])}": 1,
+        "score_sum": doc["score"],
+        "confidence_sum": doc["confidence"]
+    }
+    # Keywords only ever come from the fixed lexicon in analyze_text_sentiment,
+    # so exact per-bucket counters stay small and top-K is read off them directly
+    for keyword in doc.get("keywords", []):
+        field = f"keywords.{keyword['word']}"
+        increments[field] = increments.get(field, 0) + 1
+    return increments
+
+async def update_sentiment_analytics(doc: Dict[str, Any]):
+    """Fold a new sentiment analysis into its hourly analytics bucket"""
+    try:
+        bucket = get_sentiment_bucket(to_datetime(doc["created_at"]))
+        await db.sentiment_analytics.update_one(
+            {"_id": bucket},
+            {"$inc": build_sentiment_increments(doc)},
+            upsert=True
+        )
+    except Exception as e:
+        # Analytics are derived data; never fail the analysis request over them
+        logger.error(f"Error updating sentiment analytics: {e}")
+
+async def rebuild_sentiment_buckets(end: datetime, start: Optional[datetime] = None) -> int:
+    """Recompute and replace the analytics buckets for analyses created in [start, end)"""
+    created_range: Dict[str, Any] = {"$ne": None, "$lt": end}
+    if start:
+        created_range["$gte"] = start
+    
+    prepare = [
+        {"$addFields": {
+            "_created": {"$convert": {"input": "$created_at", "to": "date", "onError": None, "onNull": None}}
+        }},
+        {"$match": {"_created": created_range}},
+        {"$addFields": {
+            "_bucket": {"$dateToString": {"date": "$_created", "format": "%Y-%m-%dT%H:00:00+00:00"}}
+        }}
+    ]
+    score_bin = {"$min": [
+        {"$floor": {"$multiply": [
+            {"$add": [{"$max": [-1, {"$min": [1, "$score"]}]}, 1]},
+            SENTIMENT_HISTOGRAM_BINS / 2
+        ]}},
+        SENTIMENT_HISTOGRAM_BINS - 1
+    ]}
+    
+    buckets: Dict[str, Dict[str, Any]] = {}
+    def get_bucket(bucket_id: str) -> Dict[str, Any]:
+        return buckets.setdefault(bucket_id, {
+            "_id": bucket_id, "total": 0, "labels": {}, "histogram": {},
+            "score_sum": 0.0, "confidence_sum": 0.0, "keywords": {}
+        })
+    
+    # Counts and sums per (hour, label, score bin)
+    cursor = db.sentiment_analyses.aggregate(prepare + [
+        {"$group": {
+            "_id": {"bucket": "$_bucket", "sentiment": "$sentiment", "bin": score_bin},
+            "count": {"$sum": 1},
+            "score_sum": {"$sum": "$score"},
+            "confidence_sum": {"$sum": "$confidence"}
+        }}
+    ], allowDiskUse=True)
+    async for row in cursor:
+        bucket = get_bucket(row["_id"]["bucket"])
+        sentiment = row["_id"]["sentiment"]
+        score_bin_key = str(int(row["_id"]["bin"]))
+        bucket["total"] += row["count"]
+        bucket["labels"][sentiment] = bucket["labels"].get(sentiment, 0) + row["count"]
+        bucket["histogram"][score_bin_key] = bucket["histogram"].get(score_bin_key, 0) + row["count"]
+        bucket["score_sum"] += row["score_sum"]
+        bucket["confidence_sum"] += row["confidence_sum"]
+    
+    # Keyword counts per hour
+    cursor = db.sentiment_analyses.aggregate(prepare + [
+        {"$unwind": "$keywords"},
+        {"$group": {"_id": {"bucket": "$_bucket", "word": "$keywords.word"}, "count": {"$sum": 1}}}
+    ], allowDiskUse=True)
+    async for row in cursor:
+        get_bucket(row["_id"]["bucket"])["keywords"][row["_id"]["word"]] = row["count"]
+    
+    operations = [ReplaceOne({"_id": bucket_id}, bucket, upsert=True) for bucket_id, bucket in buckets.items()]
+    for offset in range(0, len(operations), SENTIMENT_BACKFILL_BATCH_SIZE):
+        await db.sentiment_analytics.bulk_write(
+            operations[offset:offset + SENTIMENT_BACKFILL_BATCH_SIZE], ordered=False
+        )
+        await renew_migration("sentiment_analytics_backfill")
+    
+    return len(buckets)
+
+async def backfill_sentiment_analytics():
+    """Rebuild analytics buckets from the raw analyses
+
+    Each bucket is recomputed with an aggregation and replaced whole, so the job
+    can be rerun or taken over after a crash without double counting. Live
+    counters only see inserts made since this deploy, so the hour in progress
+    is rebuilt once more after it closes before the job is marked done.
+    """
+    if not await claim_migration("sentiment_analytics_backfill"):
+        return
+    
+    try:
+        current_hour = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        next_hour = current_hour + timedelta(hours=1)
+        rebuilt = await rebuild_sentiment_buckets(current_hour)
+        
+        cutover = next_hour + timedelta(seconds=SENTIMENT_BACKFILL_GRACE_SECONDS)
+        while True:
+            remaining = (cutover - datetime.now(timezone.utc)).total_seconds()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(remaining, MIGRATION_LEASE_SECONDS / 2))
+            await renew_migration("sentiment_analytics_backfill")
+        rebuilt += await rebuild_sentiment_buckets(next_hour, start=current_hour)
+        
+        await finish_migration("sentiment_analytics_backfill")
+        logger.info(f"Backfilled {rebuilt} sentiment analytics buckets")
+    except asyncio.CancelledError:
+        await release_migration("sentiment_analytics_backfill")
+        raise
+    except Exception as e:
+        logger.error(f"Error backfilling sentiment analytics: {e}")
+        await release_migration("sentiment_analytics_backfill")
+
+def summarize_sentiment_buckets(
+    bucket_ids: List[str],
+    buckets: List[Dict[str, Any]],
+    top_k: int
+) -> Dict[str, Any]:
+    """Combine hourly analytics buckets into distribution, trend and keyword summaries"""
+    buckets_by_id = {bucket["_id"]: bucket for bucket in buckets}
+    total = 0
+    score_sum = 0.0
+    confidence_sum = 0.0
+    distribution = {label: 0 for label in SENTIMENT_LABELS}
+    histogram = [0] * SENTIMENT_HISTOGRAM_BINS
+    keyword_counts: Dict[str, int] = {}
+    trends = []
+    
+    # One trend entry per hour in the window, zeroed where no bucket exists
+    for bucket_id in bucket_ids:
+        bucket = buckets_by_id.get(bucket_id, {})
+        labels = bucket.get("labels", {})
+        bucket_total = bucket.get("total", 0)
+        total += bucket_total
+        score_sum += bucket.get("score_sum", 0)
+        confidence_sum += bucket.get("confidence_sum", 0)
+        
+        for label, count in labels.items():
+            distribution[label] = distribution.get(label, 0) + count
+        for index, count in bucket.get("histogram", {}).items():
+            histogram[int(index)] += count
+        for word, count in bucket.get("keywords", {}).items():
+            keyword_counts[word] = keyword_counts.get(word, 0) + count
+        
+        trends.append({
+            "bucket": bucket_id,
+            "total": bucket_total,
+            "labels": {label: labels.get(label, 0) for label in SENTIMENT_LABELS},
+            "average_score": round(bucket.get("score_sum", 0) / bucket_total, 3) if bucket_total else 0
+        })
+    
+    width = 2 / SENTIMENT_HISTOGRAM_BINS
+    top_keywords = heapq.nlargest(top_k, keyword_counts.items(), key=lambda item: item[1])
+    
+    return {
+        "total_analyses": total,
+        "distribution": distribution,
+        "average_score": round(score_sum / total, 3) if total else 0,
+        "average_confidence": round(confidence_sum / total, 1) if total else 0,
+        "score_histogram": [
+            {
+                "min_score": round(-1 + index * width, 2),
+                "max_score": round(-1 + (index + 1) * width, 2),
+                "count": count
+            }
+            for index, count in enumerate(histogram)
+        ],
+        "trends": trends,
+        "top_keywords": [{"word": word, "count": count} for word, count in top_keywords]
+    }
+
 async def generate_recommendation_data(category: str, preferences: Dict[str, Any] = {}) -> List[Dict[str, Any]]:
     """Generate recommendation data based on category"""
     recommendations = {
@@ -592,7 +1265,7 @@ async def check_performance_alerts(service: str, metric_type: str, value: float)
             "service": service,
             "message": f"Performance alert: {metric_type} = {value}",
             "metadata": {"metric_type": metric_type, "value": value, "threshold": threshold},
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         })
 
 def get_default_config(agent_type: str) -> Dict[str, Any]:
@@ -630,14 +1303,15 @@ def get_default_config(agent_type: str) -> Dict[str, Any]:
 async def initialize_agent_tasks(agent_id: str):
     """Initialize agent tasks tracking"""
     try:
+        now = datetime.now(timezone.utc)
         await db.agent_tasks.insert_one({
             "_id": str(uuid.uuid4()),
             "agent_id": agent_id,
             "tasks_completed": 0,
             "tasks_failed": 0,
             "average_response_time": 0,
-            "last_activity": datetime.now(timezone.utc).isoformat(),
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "last_activity": now,
+            "created_at": now
         })
     except Exception as e:
         logger.error(f"Error initializing agent tasks: {e}")
@@ -645,7 +1319,10 @@ async def initialize_agent_tasks(agent_id: str):
 async def get_agent_stats(agent_id: str) -> Optional[Dict[str, Any]]:
     """Get agent statistics"""
     try:
-        data = await db.agent_tasks.find_one({"agent_id": agent_id})
+        remaining = get_remaining_ms()
+        if remaining is not None and remaining <= 0:
+            raise ExecutionTimeout("Request deadline exceeded before agent stats")
+        data = await db.agent_tasks.find_one({"agent_id": agent_id}, max_time_ms=remaining)
         if not data:
             return None
         
@@ -657,12 +1334,14 @@ async def get_agent_stats(agent_id: str) -> Optional[Dict[str, Any]]:
                 data.get("tasks_failed", 0)
             ),
             "average_response_time": data.get("average_response_time", 0),
-            "last_activity": data.get("last_activity"),
+            "last_activity": to_datetime(data.get("last_activity")),
             "uptime_percentage": calculate_uptime(
                 data.get("created_at"),
                 data.get("last_activity")
             )
         }
+    except ExecutionTimeout:
+        raise
     except Exception as e:
         logger.error(f"Error getting agent stats: {e}")
         return None
@@ -674,16 +1353,15 @@ def calculate_success_rate(completed: int, failed: int) -> float:
         return 0.0
     return round((completed / total) * 100, 1)
 
-def calculate_uptime(created_at: str, last_activity: str) -> float:
+def calculate_uptime(created_at: Any, last_activity: Any) -> float:
     """Calculate uptime percentage"""
     if not created_at or not last_activity:
         return 0.0
     
     try:
-        from dateutil.parser import parse
         now = datetime.now(timezone.utc)
-        created = parse(created_at)
-        last_active = parse(last_activity)
+        created = to_datetime(created_at)
+        last_active = to_datetime(last_activity)
         
         total_time = (now - created).total_seconds()
         active_time = (last_active - created).total_seconds()
@@ -41,6 +41,11 @@ class ApiClient {
     return this.request(`/api/sentiment-agent?${searchParams}`);
   }
 
+  async getSentimentAnalytics(params = {}) {
+    const searchParams = new URLSearchParams(params);
+    return this.request(`/api/sentiment-agent/analytics?${searchParams}`);
+  }
+
   async analyzeSentiment(text) {
     return this.request('/api/sentiment-agent', {
       method: 'POST',